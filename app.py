@@ -1,15 +1,20 @@
 from flask import Flask, jsonify, render_template, request, redirect, url_for, session, flash
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, or_, select
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
 import requests
 import time
 import random
 import os
 import threading
+import asyncio
+import collections
+import uuid
 from datetime import datetime, timedelta
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CollectorRegistry
-from prometheus_client.exposition import CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, make_wsgi_app
 
 # --- Application Setup ---
 app = Flask(__name__) # Flask will look for a 'templates' folder in the same directory
@@ -17,12 +22,29 @@ app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'secret_key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///status_app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+# Explicit KDF cost so /register and /login CPU time doesn't drift with Werkzeug's defaults.
+# Existing hashes keep verifying, since check_password_hash reads the method from the stored hash.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+# Pool tuning for server databases (the poller and request handlers share the pool).
+# LIFO keeps reusing the most recently returned (warm) connection; pre_ping drops dead ones.
+# SQLite uses its own pool classes, so these options only apply to real DB servers.
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'pool_use_lifo': True,
+    }
 
 CORS(app)
 db = SQLAlchemy(app)
 
 # --- Prometheus Metrics ---
 prometheus_registry = CollectorRegistry()
+# Fewer buckets than prometheus_client's default 15, covering the range these latencies actually fall in.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float("inf"))
 
 APP_REQUEST_COUNT = Counter(
     'enhanced_status_app_requests_total',
@@ -34,18 +56,19 @@ APP_REQUEST_LATENCY = Histogram(
     'enhanced_status_app_request_latency_seconds',
     'Request latency for EnhancedStatusAggregator API/endpoints',
     ['endpoint'],
+    buckets=LATENCY_BUCKETS,
     registry=prometheus_registry
 )
 USER_SERVICE_POLL_COUNT = Counter(
     'enhanced_status_app_user_service_poll_total',
     'Total polls to user-defined mock services',
-    ['user_id', 'service_name', 'status_code_simulated'],
+    ['status_code_simulated'],
     registry=prometheus_registry
 )
 USER_SERVICE_POLL_LATENCY = Histogram(
     'enhanced_status_app_user_service_poll_latency_seconds',
     'Latency of polling user-defined mock services',
-    ['user_id', 'service_name'],
+    buckets=LATENCY_BUCKETS,
     registry=prometheus_registry
 )
 ACTIVE_USERS_GAUGE = Gauge(
@@ -67,12 +90,12 @@ BACKGROUND_POLLER_ERRORS = Counter(
 # --- Database Models ---
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
+    username = db.Column(db.String(80), unique=True, nullable=False) # unique=True already creates the lookup index
     password_hash = db.Column(db.String(200), nullable=False)
     services = db.relationship('MonitoredService', backref='owner', lazy=True, cascade="all, delete-orphan")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -84,76 +107,204 @@ class MonitoredService(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     current_status = db.Column(db.String(50), default='Unknown')
     last_checked = db.Column(db.DateTime, default=datetime.utcnow)
+    # The unique constraint is backed by a (user_id, name) index, which also serves the
+    # per-user lookups (user_id is its leading column) and the ORDER BY name on the dashboard,
+    # so no separate user_id index is needed.
     __table_args__ = (db.UniqueConstraint('user_id', 'name', name='_user_service_name_uc'),)
 
+class PollerLease(db.Model):
+    """Single-row lease electing the one process (of reloader/worker copies) that runs the poller."""
+    id = db.Column(db.Integer, primary_key=True)
+    holder = db.Column(db.String(64), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
 
 # --- Helper Functions ---
-def simulate_poll_service(service_id, service_name, user_id_for_metrics):
-    start_time = time.time()
+# Poll simulation constants, hoisted out of the per-poll path.
+_poll_rng = random.Random()
+_POSSIBLE_STATUSES = ("Operational", "Degraded", "Minor Outage")
+_STATUS_CUM_WEIGHTS = (0.92, 0.97, 1.0) # cumulative form of weights 0.92 / 0.05 / 0.03
+# One draw decides the error branch: 5% timeout, then 10% of the remainder (9.5%) simulated 500.
+_TIMEOUT_THRESHOLD = 0.05
+_SERVER_ERROR_THRESHOLD = 0.05 + 0.95 * 0.10
+
+def _simulated_outcome(service_id, service_name):
+    """Draws a simulated poll result; returns (simulated_status_code, final_status)."""
     simulated_status_code = "unknown"
     try:
-        time.sleep(random.uniform(0.1, 0.5))
-        if random.random() < 0.05:
+        draw = _poll_rng.random()
+        if draw < _TIMEOUT_THRESHOLD:
             simulated_status_code = "timeout_error"
             raise requests.exceptions.Timeout("Simulated timeout")
-        elif random.random() < 0.10:
+        elif draw < _SERVER_ERROR_THRESHOLD:
             simulated_status_code = "500_simulated_error"
             raise requests.exceptions.HTTPError("Simulated 500 Server Error")
-        possible_statuses = ["Operational", "Degraded", "Minor Outage"]
-        status = random.choices(possible_statuses, weights=[0.92, 0.05, 0.03], k=1)[0]
+        status = _poll_rng.choices(_POSSIBLE_STATUSES, cum_weights=_STATUS_CUM_WEIGHTS, k=1)[0]
         simulated_status_code = "200_simulated_ok"
         final_status = status
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Simulated polling error for service '{service_name}' (ID: {service_id}): {e}")
         final_status = "Major Outage"
-    finally:
-        latency = time.time() - start_time
-        USER_SERVICE_POLL_LATENCY.labels(user_id=str(user_id_for_metrics), service_name=service_name).observe(latency)
-        USER_SERVICE_POLL_COUNT.labels(user_id=str(user_id_for_metrics), service_name=service_name, status_code_simulated=simulated_status_code).inc()
-    with app.app_context():
-        service_to_update = MonitoredService.query.get(service_id)
-        if service_to_update:
-            service_to_update.current_status = final_status
-            service_to_update.last_checked = datetime.utcnow()
-            db.session.commit()
-        else:
-            app.logger.warning(f"Background poller: Service ID {service_id} not found for update.")
-    return final_status
+    return simulated_status_code, final_status
+
+def _record_poll_counts(status_code_counts):
+    """Adds {simulated_status_code: n} to the poll counter with one labels() lookup per status code."""
+    # Only bounded label values here; user/service identity belongs in logs and the DB,
+    # otherwise every new user or service adds fresh time series to Prometheus.
+    for simulated_status_code, count in status_code_counts.items():
+        USER_SERVICE_POLL_COUNT.labels(status_code_simulated=simulated_status_code).inc(count)
+
+async def _simulate_status_async(service_id, service_name):
+    """
+    Simulates a poll of one service and records its latency. Does not touch the DB.
+    The simulated network wait yields to the event loop instead of blocking.
+    Returns (simulated_status_code, final_status); the caller aggregates the poll counter per cycle.
+    """
+    start_time = time.perf_counter()
+    await asyncio.sleep(_poll_rng.uniform(0.1, 0.5))
+    simulated_status_code, final_status = _simulated_outcome(service_id, service_name)
+    USER_SERVICE_POLL_LATENCY.observe(time.perf_counter() - start_time)
+    return simulated_status_code, final_status
+
+# Core (table-level) UPDATE by primary key: no SELECT first, and a list of parameter sets
+# runs as a single executemany.
+_service_status_update = (
+    MonitoredService.__table__.update()
+    .where(MonitoredService.__table__.c.id == bindparam('b_id'))
+    .values(current_status=bindparam('b_status'), last_checked=bindparam('b_checked'))
+)
+
+def save_poll_results(updates):
+    """Writes a cycle's worth of {'b_id', 'b_status', 'b_checked'} rows in one statement and one commit."""
+    if not updates:
+        return
+    db.session.execute(_service_status_update, updates)
+    db.session.commit()
+
+def get_user_service_rows(user_id):
+    """
+    Returns a user's services as plain rows (attribute access like the model, by column name),
+    skipping ORM instance construction and identity-map bookkeeping for read-only views.
+    """
+    return db.session.execute(
+        select(MonitoredService.id, MonitoredService.name, MonitoredService.mock_url,
+               MonitoredService.current_status, MonitoredService.last_checked)
+        .where(MonitoredService.user_id == user_id)
+        .order_by(MonitoredService.name)
+    ).all()
 
 # --- Background Polling Thread ---
 POLL_INTERVAL_SECONDS = 60
+POLLER_MAX_CONCURRENCY = 100
 poller_thread_stop_event = threading.Event()
 
+# Every process that starts a poller thread competes for the lease; only the holder polls.
+POLLER_LEASE_ID = 1
+POLLER_LEASE_SECONDS = POLL_INTERVAL_SECONDS * 2
+_poller_instance_id = uuid.uuid4().hex
+
+def _acquire_poller_lease():
+    """Takes or renews the poller lease. Returns True if this process should poll this cycle."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=POLLER_LEASE_SECONDS)
+    lease = PollerLease.__table__
+    result = db.session.execute(
+        lease.update()
+        .where(lease.c.id == POLLER_LEASE_ID)
+        .where(or_(lease.c.holder == _poller_instance_id, lease.c.expires_at < now))
+        .values(holder=_poller_instance_id, expires_at=expires_at)
+    )
+    if result.rowcount == 0:
+        # Either another process holds a live lease, or the row doesn't exist yet.
+        try:
+            db.session.execute(lease.insert().values(id=POLLER_LEASE_ID, holder=_poller_instance_id, expires_at=expires_at))
+        except IntegrityError:
+            db.session.rollback()
+            return False
+    db.session.commit()
+    return True
+
+def _release_poller_lease():
+    lease = PollerLease.__table__
+    db.session.execute(
+        lease.update()
+        .where(lease.c.id == POLLER_LEASE_ID)
+        .where(lease.c.holder == _poller_instance_id)
+        .values(expires_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+async def _poll_one(semaphore, service):
+    """Polls a single (id, name, user_id) tuple; returns (simulated_status_code, update row) or None if stopping."""
+    service_id, service_name, user_id = service
+    async with semaphore:
+        if poller_thread_stop_event.is_set(): return None
+        app.logger.debug(f"Background polling service: {service_name} (ID: {service_id}) for user {user_id}")
+        simulated_status_code, final_status = await _simulate_status_async(service_id, service_name)
+    return simulated_status_code, {'b_id': service_id, 'b_status': final_status, 'b_checked': datetime.utcnow()}
+
+async def _poll_all(services):
+    """Returns (update rows, Counter of simulated status codes) for one cycle."""
+    # One event loop multiplexes every in-flight poll; the semaphore caps how many run at once.
+    semaphore = asyncio.Semaphore(POLLER_MAX_CONCURRENCY)
+    results = await asyncio.gather(*[_poll_one(semaphore, service) for service in services])
+    updates = []
+    cycle_counts = collections.Counter()
+    for result in results:
+        if result is None: continue
+        simulated_status_code, update = result
+        cycle_counts[simulated_status_code] += 1
+        updates.append(update)
+    return updates, cycle_counts
+
 def background_service_poller():
     app.logger.info("Background service poller thread started.")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     while not poller_thread_stop_event.is_set():
         try:
             with app.app_context():
+                if not _acquire_poller_lease():
+                    app.logger.debug("Another process holds the poller lease; skipping this cycle.")
+                    poller_thread_stop_event.wait(POLL_INTERVAL_SECONDS)
+                    continue
                 services_to_poll = MonitoredService.query.all()
                 USER_SERVICES_MONITORED_GAUGE.set(len(services_to_poll))
                 if not services_to_poll: app.logger.debug("No services to poll.")
                 else: app.logger.info(f"Polling {len(services_to_poll)} services...")
-                for service in services_to_poll:
-                    if poller_thread_stop_event.is_set(): break
-                    app.logger.debug(f"Background polling service: {service.name} (ID: {service.id}) for user {service.user_id}")
-                    simulate_poll_service(service.id, service.name, service.user_id)
-                    poller_thread_stop_event.wait(0.1)
+                # Plain tuples for the coroutines, so the ORM instances are not needed while polling.
+                services = [(s.id, s.name, s.user_id) for s in services_to_poll]
+                updates, cycle_counts = loop.run_until_complete(_poll_all(services))
+                _record_poll_counts(cycle_counts)
+                # The DB write happens once per cycle, after every poll has finished.
+                # Renew the lease first: a cycle longer than POLLER_LEASE_SECONDS lets a standby
+                # take over mid-cycle, and its results must win over this (now stale) cycle's.
+                if _acquire_poller_lease():
+                    save_poll_results(updates)
+                else:
+                    app.logger.warning("Lost the poller lease during a long cycle; discarding this cycle's results.")
         except Exception as e:
             BACKGROUND_POLLER_ERRORS.inc()
             app.logger.error(f"Error in background poller: {e}", exc_info=True)
             poller_thread_stop_event.wait(POLL_INTERVAL_SECONDS / 2)
         app.logger.debug(f"Background poller finished a cycle. Waiting for {POLL_INTERVAL_SECONDS} seconds.")
         poller_thread_stop_event.wait(POLL_INTERVAL_SECONDS)
+    loop.close()
+    try:
+        with app.app_context():
+            _release_poller_lease() # let a standby process take over without waiting for expiry
+    except Exception as e:
+        app.logger.warning(f"Could not release poller lease: {e}")
     app.logger.info("Background service poller thread stopped.")
 
 # --- Middleware for Metrics ---
 @app.before_request
-def before_request_metrics(): request.start_time = time.time()
+def before_request_metrics(): request.start_time = time.perf_counter()
 
 @app.after_request
 def after_request_metrics(response):
     if hasattr(request, 'start_time') and request.endpoint:
-        latency = time.time() - request.start_time
+        latency = time.perf_counter() - request.start_time
         APP_REQUEST_LATENCY.labels(endpoint=request.endpoint).observe(latency)
         APP_REQUEST_COUNT.labels(method=request.method, endpoint=request.endpoint, http_status=response.status_code).inc()
     return response
@@ -213,7 +364,7 @@ def dashboard_route():
         flash('Please log in.', 'warning')
         return redirect(url_for('login_route'))
     user_id = session['user_id']
-    user_services = MonitoredService.query.filter_by(user_id=user_id).order_by(MonitoredService.name).all()
+    user_services = get_user_service_rows(user_id)
     return render_template('dashboard.html', services=user_services)
 
 @app.route('/services/add', methods=['GET', 'POST'])
@@ -257,7 +408,7 @@ def delete_service_route(service_id):
 def api_get_user_services():
     if 'user_id' not in session: return jsonify({"error": "Authentication required"}), 401
     user_id = session['user_id']
-    services = MonitoredService.query.filter_by(user_id=user_id).all()
+    services = get_user_service_rows(user_id)
     output = [{"id": s.id, "name": s.name, "mock_url": s.mock_url, "current_status": s.current_status, "last_checked": s.last_checked.isoformat() if s.last_checked else None} for s in services]
     return jsonify({"services": output})
 
@@ -265,33 +416,46 @@ def api_get_user_services():
 def health_check_route():
     return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()}), 200
 
-@app.route('/metrics')
-def metrics_route():
-    return generate_latest(prometheus_registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+# /metrics is served by prometheus_client's own WSGI app, mounted in front of Flask, so scrapes
+# skip the Flask request pipeline (and don't show up in the request metrics themselves).
+app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {'/metrics': make_wsgi_app(prometheus_registry)})
 
 # Add a context processor to make 'now' available to all templates for the copyright year.
 @app.context_processor
 def inject_now():
     return {'now': datetime.utcnow()}
 
-# --- Main Execution ---
-if __name__ == '__main__':
+# --- Process Startup ---
+_poller_thread = None
+
+def start_background_poller():
+    """
+    Ensures the DB tables exist and starts this process's poller thread (at most one per process).
+    Called from every entry point: `python app.py` and the ASGI lifespan in asgi.py. Each server
+    worker may call it; the poller lease makes sure only one of them actually polls.
+    """
+    global _poller_thread
+    if _poller_thread is not None and _poller_thread.is_alive():
+        return _poller_thread
     with app.app_context():
         db.create_all()
         app.logger.info("Database tables created/ensured.")
+    poller_thread_stop_event.clear()
+    _poller_thread = threading.Thread(target=background_service_poller, daemon=True)
+    _poller_thread.start()
+    app.logger.info("Background poller thread initiated.")
+    return _poller_thread
 
-    # Start background poller thread
-    # This logic helps prevent the thread from starting multiple times when Flask's reloader is active.
-    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
-        if not (app.debug and os.environ.get('WERKZEUG_RUN_MAIN') == 'true' and hasattr(app, '_poller_started') and app._poller_started):
-            poller = threading.Thread(target=background_service_poller, daemon=True)
-            poller.start()
-            app.logger.info("Background poller thread initiated.")
-            if app.debug: # Mark that poller has been started in the main process
-                app._poller_started = True
-    elif os.environ.get('WERKZEUG_RUN_MAIN') != 'true': # Werkzeug reloader child process
-        app.logger.info("Skipping background poller start in Werkzeug reloader child process.")
+def stop_background_poller(timeout=5):
+    poller_thread_stop_event.set()
+    if _poller_thread is not None and _poller_thread.is_alive():
+        _poller_thread.join(timeout=timeout)
 
+# --- Main Execution ---
+if __name__ == '__main__':
+    # With the reloader active this module runs in both the watcher and the serving process;
+    # the poller lease keeps only one of them polling.
+    start_background_poller()
 
     app.run(debug=True, host='0.0.0.0', port=5000) # use_reloader=True is default in debug
 
@@ -301,8 +465,5 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         app.logger.info("Shutdown signal received, stopping poller...")
     finally:
-        poller_thread_stop_event.set()
-        # Check if 'poller' was defined in the scope (it might not be if WERKZEUG_RUN_MAIN was false)
-        if 'poller' in locals() and poller.is_alive():
-            poller.join(timeout=5)
-        app.logger.info("Application shutdown attempt complete.")
\ No newline at end of file
+        stop_background_poller()
+        app.logger.info("Application shutdown attempt complete.")
@@ -0,0 +1,42 @@
+"""
+ASGI entry point for EnhancedStatusAggregator. Serve with an ASGI server instead of the
+Werkzeug dev server, e.g.:
+
+    uvicorn asgi:asgi_app --loop uvloop --http httptools
+"""
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:
+    raise ImportError("The ASGI entry point requires asgiref: pip install asgiref") from e
+
+from app import app, start_background_poller, stop_background_poller
+
+
+class LifespanWsgiToAsgi:
+    """
+    WsgiToAsgi only speaks HTTP, so this wrapper answers the ASGI lifespan protocol itself:
+    startup creates the tables and starts this worker's poller, shutdown stops it.
+    """
+    def __init__(self, wsgi_app):
+        self.http_app = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            await self.http_app(scope, receive, send)
+            return
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    start_background_poller()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                stop_background_poller()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+asgi_app = LifespanWsgiToAsgi(app)
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 
 # --- Configuration ---
@@ -10,6 +12,18 @@ DEFAULT_PROMETHEUS_URL = "http://localhost:9090"
 DEFAULT_ALERTMANAGER_URL = "http://localhost:9093"
 DEFAULT_APP_JOB_NAME_IN_PROMETHEUS = "enhanced_status_aggregator"
 DEFAULT_TIMEOUT_SECONDS = 3
+CHECK_ORDER = (
+    "App Health",
+    "Prometheus Health",
+    "Prometheus Scrapes App",
+    "Alertmanager Health",
+    "Prometheus to Alertmanager Link",
+)
+
+# Shared session so checks against the same host (e.g. both Prometheus API calls) reuse a keep-alive connection.
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
 
 # ANSI escape codes for colors
 class Colors:
@@ -33,7 +47,7 @@ def check_endpoint(name, url, expected_status_code=200, timeout=DEFAULT_TIMEOUT_
     """
     print(f"{Colors.BLUE}Checking: {name} at {url}...{Colors.ENDC}")
     try:
-        response = requests.get(url, timeout=timeout)
+        response = _SESSION.get(url, timeout=timeout)
         if response.status_code == expected_status_code:
             print_status(f"{name} is healthy (Status: {response.status_code})", True)
             return True
@@ -58,13 +72,19 @@ def check_prometheus_app_target(prometheus_url, app_job_name, app_url, timeout=D
     targets_api_url = f"{prometheus_url}/api/v1/targets"
     print(f"{Colors.BLUE}Checking: Prometheus target '{app_job_name}' at {targets_api_url}...{Colors.ENDC}")
     try:
-        response = requests.get(targets_api_url, timeout=timeout)
+        response = _SESSION.get(targets_api_url, timeout=timeout)
         response.raise_for_status() # Raise an exception for HTTP error codes
         targets_data = response.json()
 
         app_target_found_and_up = False
         app_target_found_but_down = False
 
+        # The app URL is loop-invariant, so parse it once rather than per target.
+        parsed_app_url = urlparse(app_url)
+        app_netloc = parsed_app_url.netloc
+        app_metrics_path = (parsed_app_url.path or "/").rstrip("/") + "/metrics"
+        app_metrics_url = app_url + "/metrics"
+
         if targets_data.get("status") == "success":
             active_targets = targets_data.get("data", {}).get("activeTargets", [])
             for target_group in active_targets:
@@ -76,16 +96,16 @@ def check_prometheus_app_target(prometheus_url, app_job_name, app_url, timeout=D
 
                     # A simple check if the app_url is contained within the scrape_url
                     # This handles cases where Prometheus might add http:// or other params
-                    parsed_app_url_path = urlparse(app_url).path or "/" # Get path, default to /
-                    parsed_scrape_url_path = urlparse(scrape_url_from_target).path or "/"
+                    parsed_scrape_url = urlparse(scrape_url_from_target)
+                    parsed_scrape_url_path = parsed_scrape_url.path or "/"
 
                     # Check if the job is up and the scrape URL roughly matches
                     # A more precise match might be needed for complex setups
                     if target_group.get("health") == "up":
                          # Check if the scrape URL contains the app's host and port, and the metrics path
-                         if urlparse(app_url).netloc in urlparse(scrape_url_from_target).netloc and \
-                            (parsed_app_url_path + "/metrics" == parsed_scrape_url_path or # if app_url is base
-                             app_url + "/metrics" == scrape_url_from_target): # if app_url includes path
+                         if app_netloc in parsed_scrape_url.netloc and \
+                            (app_metrics_path == parsed_scrape_url_path or # if app_url is base
+                             app_metrics_url == scrape_url_from_target): # if app_url includes path
                             app_target_found_and_up = True
                             break
                     else: # Target found but not up
@@ -121,7 +141,7 @@ def check_prometheus_alertmanager_link(prometheus_url, alertmanager_url, timeout
     alertmanagers_api_url = f"{prometheus_url}/api/v1/alertmanagers"
     print(f"{Colors.BLUE}Checking: Prometheus to Alertmanager link (expecting {alertmanager_url}) at {alertmanagers_api_url}...{Colors.ENDC}")
     try:
-        response = requests.get(alertmanagers_api_url, timeout=timeout)
+        response = _SESSION.get(alertmanagers_api_url, timeout=timeout)
         response.raise_for_status()
         alertmanagers_data = response.json()
 
@@ -157,6 +177,18 @@ def check_prometheus_alertmanager_link(prometheus_url, alertmanager_url, timeout
         print_status(f"Prometheus: Could not decode JSON response from {alertmanagers_api_url}.", False)
         return False
 
+def run_checks_concurrently(checks):
+    """
+    Runs independent checks in parallel so total wall time is bounded by the slowest one.
+    Takes a dict of {check name: zero-argument callable}; returns {check name: result}.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        futures = {executor.submit(fn): name for name, fn in checks.items()}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
 def main():
     parser = argparse.ArgumentParser(description="SRE Stack Health Checker for EnhancedStatusAggregator.")
     parser.add_argument("--app-url", default=DEFAULT_APP_URL, help=f"URL of the EnhancedStatusAggregator app (default: {DEFAULT_APP_URL})")
@@ -175,38 +207,31 @@ def main():
     print(f"Request Timeout: {args.timeout}s\n")
 
     results = {}
-    all_ok = True
-
-    # Check 1: Application Health
-    results["App Health"] = check_endpoint("EnhancedStatusAggregator App", f"{args.app_url}/health", timeout=args.timeout)
-    if not results["App Health"]: all_ok = False
 
-    # Check 2: Prometheus Server Health
-    results["Prometheus Health"] = check_endpoint("Prometheus Server", f"{args.prometheus_url}/-/healthy", timeout=args.timeout)
-    if not results["Prometheus Health"]: all_ok = False
-
-    # Check 3: Prometheus Scraping Application Target (only if Prometheus is healthy)
-    if results.get("Prometheus Health"):
-        results["Prometheus Scrapes App"] = check_prometheus_app_target(args.prometheus_url, args.app_job_name, args.app_url, timeout=args.timeout)
-        if not results["Prometheus Scrapes App"]: all_ok = False
+    # Phase 1: the three server health checks are independent, so run them concurrently.
+    health_checks = {
+        "App Health": lambda: check_endpoint("EnhancedStatusAggregator App", f"{args.app_url}/health", timeout=args.timeout),
+        "Prometheus Health": lambda: check_endpoint("Prometheus Server", f"{args.prometheus_url}/-/healthy", timeout=args.timeout),
+        "Alertmanager Health": lambda: check_endpoint("Alertmanager Server", f"{args.alertmanager_url}/-/healthy", timeout=args.timeout),
+    }
+    results.update(run_checks_concurrently(health_checks))
+
+    # Phase 2: the Prometheus API checks (only if Prometheus is healthy), also run concurrently.
+    if results["Prometheus Health"]:
+        prometheus_checks = {
+            "Prometheus Scrapes App": lambda: check_prometheus_app_target(args.prometheus_url, args.app_job_name, args.app_url, timeout=args.timeout),
+            "Prometheus to Alertmanager Link": lambda: check_prometheus_alertmanager_link(args.prometheus_url, args.alertmanager_url, timeout=args.timeout),
+        }
+        results.update(run_checks_concurrently(prometheus_checks))
     else:
         results["Prometheus Scrapes App"] = False # Cannot check if Prometheus is down
         print_status("Prometheus: Skipping app target check as Prometheus server is down.", False)
-        all_ok = False
-
-
-    # Check 4: Alertmanager Server Health
-    results["Alertmanager Health"] = check_endpoint("Alertmanager Server", f"{args.alertmanager_url}/-/healthy", timeout=args.timeout)
-    if not results["Alertmanager Health"]: all_ok = False
-
-    # Check 5: Prometheus to Alertmanager Link (only if Prometheus is healthy)
-    if results.get("Prometheus Health"):
-        results["Prometheus to Alertmanager Link"] = check_prometheus_alertmanager_link(args.prometheus_url, args.alertmanager_url, timeout=args.timeout)
-        if not results["Prometheus to Alertmanager Link"]: all_ok = False
-    else:
         results["Prometheus to Alertmanager Link"] = False # Cannot check if Prometheus is down
         print_status("Prometheus: Skipping Alertmanager link check as Prometheus server is down.", False)
-        all_ok = False
+
+    # Report in the fixed check order, regardless of which check finished first.
+    results = {name: results[name] for name in CHECK_ORDER}
+    all_ok = all(results.values())
 
     print(f"\n{Colors.YELLOW}--- Summary ---{Colors.ENDC}")
     for check_name, status in results.items():